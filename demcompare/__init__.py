@@ -24,7 +24,6 @@ DEMcompare aims at coregistering and comparing two Digital Elevation Models(DEM)
 """
 
 # Standard imports
-import copy
 import json
 import logging
 import logging.config
@@ -232,8 +231,8 @@ def compute_coregistration(
             cfg["plani_results"]["dx"] = {"bias_value": 0, "unit": "m"}
             cfg["plani_results"]["dy"] = {"bias_value": 0, "unit": "m"}
             cfg["alti_results"] = {}
-            cfg["alti_results"]["rectifiedDSM"] = copy.deepcopy(cfg["inputDSM"])
-            cfg["alti_results"]["rectifiedRef"] = copy.deepcopy(cfg["inputRef"])
+            cfg["alti_results"]["rectifiedDSM"] = dict(cfg["inputDSM"])
+            cfg["alti_results"]["rectifiedRef"] = dict(cfg["inputRef"])
 
             coreg_dem = save_tif(
                 coreg_dem,
@@ -23,18 +23,36 @@ Coregistration part of dsm_compare
 """
 
 # Standard imports
-import copy
 import os
 
 # Third party imports
 import numpy as np
 
 # DEMcompare imports
-from .img_tools import save_tif, translate, translate_to_coregistered_geometry
+from .img_tools import (
+    save_tif,
+    translate_many,
+    translate_to_coregistered_geometry,
+)
 from .nuth_kaab_universal_coregistration import nuth_kaab_lib
 from .output_tree_design import get_out_dir, get_out_file_path
 
 
+def _nan_stats(array):
+    """
+    Count valid (non nan) values of an array and sum them
+    with a single nan mask computation
+
+    :param array: numpy array
+    :return: number of valid values and their sum
+    """
+    valid = ~np.isnan(array)
+    nb_valid = np.count_nonzero(valid)
+    # np.sum where argument is unknown to pylint
+    # pylint: disable=unexpected-keyword-arg
+    return nb_valid, float(np.sum(array, where=valid, dtype=np.float64))
+
+
 def coregister_with_nuth_and_kaab(
     dem1, dem2, init_disp_x=0, init_disp_y=0, tmp_dir=".", nb_iters=6
 ):
@@ -86,9 +104,15 @@ def coregister_with_nuth_and_kaab(
     #    but we want to keep its georef, and so here is what we do
     #    so that coreg dem from NK are not modified,
     #    but their georef now is the one of dem2
-    coreg_dem1 = translate(coreg_dem1, x_off - 0.5, -y_off - 0.5)
-    coreg_dem2 = translate(coreg_dem2, x_off - 0.5, -y_off - 0.5)
-    final_dh = translate(final_dh, x_off - 0.5, -y_off - 0.5)
+    # (indexing avoids unbalanced-tuple-unpacking message)
+    translated = translate_many(
+        [coreg_dem1, coreg_dem2, final_dh], x_off - 0.5, -y_off - 0.5
+    )
+    coreg_dem1, coreg_dem2, final_dh = (
+        translated[0],
+        translated[1],
+        translated[2],
+    )
 
     # Eventually we return nuth and kaab results :
     #  NB : -y_off because y_off from nk is north oriented
@@ -143,7 +167,6 @@ def coregister_and_compute_alti_diff(cfg, dem1, dem2):
             ),
             nb_iters=nb_iters,
         )
-        z_bias = np.nanmean(final_dh["im"].data)
     else:
         raise NameError("coregistration method unsupported")
 
@@ -161,38 +184,51 @@ def coregister_and_compute_alti_diff(cfg, dem1, dem2):
         os.path.join(cfg["outputDir"], get_out_file_path("final_dh.tif")),
     )
 
+    # Get points and valid points numbers
+    # (and final_dh sum for the altimetric bias)
+    dh_array = final_dh["im"].data
+    dh_nb_points = dh_array.size
+    dh_nb_valid, dh_sum = _nan_stats(dh_array)
+    dem1_nb_valid = np.count_nonzero(~np.isnan(coreg_dem1["im"].data))
+    dem2_nb_valid = np.count_nonzero(~np.isnan(coreg_dem2["im"].data))
+    z_bias = dh_sum / dh_nb_valid if dh_nb_valid else np.nan
+
+    # Get coreg_dem1 resolution and units once
+    xres = coreg_dem1.attrs["xres"]
+    yres = coreg_dem1.attrs["yres"]
+    plani_unit = coreg_dem1.attrs["plani_unit"]
+    zunit = coreg_dem1.attrs["zunit"]
+
     # Update cfg
     # -> for plani_results
     cfg["plani_results"] = {}
     cfg["plani_results"]["dx"] = {
-        "bias_value": x_bias * coreg_dem1.attrs["xres"],
-        "unit": coreg_dem1.attrs["plani_unit"].name,
+        "bias_value": x_bias * xres,
+        "unit": plani_unit.name,
     }
     cfg["plani_results"]["dy"] = {
-        "bias_value": y_bias * abs(coreg_dem1.attrs["yres"]),
-        "unit": coreg_dem1.attrs["plani_unit"].name,
+        "bias_value": y_bias * abs(yres),
+        "unit": plani_unit.name,
     }
     # -> for alti_results
     cfg["alti_results"] = {}
-    cfg["alti_results"]["rectifiedDSM"] = copy.deepcopy(cfg["inputDSM"])
-    cfg["alti_results"]["rectifiedRef"] = copy.deepcopy(cfg["inputRef"])
+    cfg["alti_results"]["rectifiedDSM"] = dict(cfg["inputDSM"])
+    cfg["alti_results"]["rectifiedRef"] = dict(cfg["inputRef"])
     cfg["alti_results"]["rectifiedDSM"]["path"] = coreg_dem1.attrs["input_img"]
     cfg["alti_results"]["rectifiedRef"]["path"] = coreg_dem2.attrs["input_img"]
     cfg["alti_results"]["rectifiedDSM"]["nodata"] = coreg_dem1.attrs["no_data"]
     cfg["alti_results"]["rectifiedRef"]["nodata"] = coreg_dem2.attrs["no_data"]
     cfg["alti_results"]["dz"] = {
         "bias_value": float(z_bias),
-        "unit": coreg_dem1.attrs["zunit"].name,
-        "percent": 100
-        * np.count_nonzero(~np.isnan(final_dh["im"].data))
-        / final_dh["im"].data.size,
+        "unit": zunit.name,
+        "percent": 100 * dh_nb_valid / dh_nb_points,
     }
     cfg["alti_results"]["dzMap"] = {
         "path": final_dh.attrs["input_img"],
-        "zunit": coreg_dem1.attrs["zunit"].name,
+        "zunit": zunit.name,
         "nodata": final_dh.attrs["no_data"],
-        "nb_points": final_dh["im"].data.size,
-        "nb_valid_points": np.count_nonzero(~np.isnan(final_dh["im"].data)),
+        "nb_points": dh_nb_points,
+        "nb_valid_points": dh_nb_valid,
     }
     cfg["alti_results"]["rectifiedDSM"]["nb_points"] = coreg_dem1[
         "im"
@@ -200,31 +236,25 @@ def coregister_and_compute_alti_diff(cfg, dem1, dem2):
     cfg["alti_results"]["rectifiedRef"]["nb_points"] = coreg_dem2[
         "im"
     ].data.size
-    cfg["alti_results"]["rectifiedDSM"]["nb_valid_points"] = np.count_nonzero(
-        ~np.isnan(coreg_dem1["im"].data)
-    )
-    cfg["alti_results"]["rectifiedRef"]["nb_valid_points"] = np.count_nonzero(
-        ~np.isnan(coreg_dem2["im"].data)
-    )
+    cfg["alti_results"]["rectifiedDSM"]["nb_valid_points"] = dem1_nb_valid
+    cfg["alti_results"]["rectifiedRef"]["nb_valid_points"] = dem2_nb_valid
 
     # Print report
     print("# Coregistration results:")
     print("\nPlanimetry 2D shift between DEM and REF:")
     print(
         " -> row : {}".format(
-            cfg["plani_results"]["dy"]["bias_value"]
-            * coreg_dem1.attrs["plani_unit"]
+            cfg["plani_results"]["dy"]["bias_value"] * plani_unit
         )
     )
     print(
         " -> col : {}".format(
-            cfg["plani_results"]["dx"]["bias_value"]
-            * coreg_dem1.attrs["plani_unit"]
+            cfg["plani_results"]["dx"]["bias_value"] * plani_unit
         )
     )
     print("DEM: {}".format(cfg["inputDSM"]["path"]))
     print("REF: {}".format(cfg["inputRef"]["path"]))
     print("\nAltimetry shift between COREG_DEM and COREG_REF")
-    print((" -> alti : {}".format(z_bias * coreg_dem1.attrs["zunit"])))
+    print((" -> alti : {}".format(z_bias * zunit)))
 
     return coreg_dem1, coreg_dem2, final_dh
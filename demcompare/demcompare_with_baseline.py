@@ -25,78 +25,130 @@ Tests : Compare results against baseline
 
 # Standard imports
 import argparse
-import glob
+import csv
+import os
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat, zip_longest
 
 # Third party imports
 import argcomplete
+import numpy as np
 
 
-def load_csv(csv_file):
-    with open(csv_file, "r") as file:
-        return file.readlines()
-
-
-def check_csv(csv_ref, csv_test, csv_file, epsilon):
+def check_csv(csv_ref_file, csv_test_file, epsilon):
     """
     Check CSV function
-    """
-    if csv_ref[0] != csv_test[0]:
-        raise ValueError(
-            "Inconsistent stats between baseline ({}) "
-            "and tested version ({}) for file {}".format(
-                csv_ref[0], csv_test[0], csv_file
-            )
-        )
 
+    Both csv files are read line by line in lockstep so that
+    the check fails as soon as an inconsistency is found.
+    Values of all rows are then compared at once.
+
+    :param csv_ref_file: baseline csv file path
+    :param csv_test_file: tested csv file path
+    :param epsilon: tolerance on values differences
+    :return: list of differences
+    """
     csv_differences = []
-    # - first row of csv file is titles (hence csv[1:len(csv)])
-    for row_ref, row_test in zip(
-        csv_ref[1 : len(csv_ref)], csv_test[1 : len(csv_test)]
-    ):
-        # - we need to split a row by ',' to get columns
-        # after we removed the '\r\n' end characters
-        cols_ref = row_ref.strip("\r\n").split(",")
-        cols_test = row_test.strip("\r\n").split(",")
-
-        # - test if class are the same (first column is class name)
-        if cols_ref[0] != cols_test[0]:
+    class_names = []
+    identical_rows = []
+    rows_ref_values = []
+    rows_test_values = []
+    with open(csv_ref_file, "r", newline="") as ref_file, open(
+        csv_test_file, "r", newline=""
+    ) as test_file:
+        # - rows are split into columns by the csv readers
+        ref_reader = csv.reader(ref_file)
+        test_reader = csv.reader(test_file)
+
+        # - first row of csv file is titles
+        titles_ref = next(ref_reader, [])
+        titles_test = next(test_reader, [])
+        if titles_ref != titles_test:
             raise ValueError(
-                "Inconsistent class name for file {} between baseline ({}) "
-                "and tested version ({})".format(
-                    csv_file, cols_ref[0], cols_test[0]
+                "Inconsistent stats between baseline ({}) "
+                "and tested version ({}) for file {}".format(
+                    titles_ref, titles_test, csv_ref_file
                 )
             )
+        stat_names = titles_ref
 
-        # - first column is class name, and then we have to cast values in float
-        f_cols_ref = [
-            float(col_value) for col_value in cols_ref[1 : len(cols_ref)]
-        ]
-        f_cols_test = [
-            float(col_value) for col_value in cols_test[1 : len(cols_test)]
-        ]
-
-        # see if we differ by more than epsilon
-        results = [
-            abs(ref - test) <= epsilon
-            for ref, test in zip(f_cols_ref, f_cols_test)
-        ]
-        if sum(results) != len(results):
-            # then we have some false values
-            indices = [i for i, item in enumerate(results) if item is False]
-            for index in indices:
-                diff = OrderedDict()
-                diff["csv_file"] = csv_file
-                diff["class name"] = cols_ref[0]
-                diff["stat name"] = (
-                    csv_ref[0].strip("\r\n").split(",")[index + 1]
+        for cols_ref, cols_test in zip_longest(ref_reader, test_reader):
+            if cols_ref is None or cols_test is None:
+                raise ValueError(
+                    "Inconsistent rows number for file {} "
+                    "between baseline and tested version".format(csv_ref_file)
                 )
-                diff["baseline_val"] = f_cols_ref[index]
-                diff["test_val"] = f_cols_test[index]
-                csv_differences.append(diff)
+            class_names.append(cols_ref[0])
+            rows_ref_values.append(cols_ref[1:])
+
+            # - identical rows are cast only once
+            identical_rows.append(cols_ref == cols_test)
+            if identical_rows[-1]:
+                continue
+
+            # - test if class are the same (first column is class name)
+            if cols_ref[0] != cols_test[0]:
+                raise ValueError(
+                    "Inconsistent class name for file {} between baseline ({}) "
+                    "and tested version ({})".format(
+                        csv_ref_file, cols_ref[0], cols_test[0]
+                    )
+                )
+            rows_test_values.append(cols_test[1:])
+
+    if not class_names:
+        return csv_differences
+
+    # - first column is class name, and then we cast values in float
+    f_rows_ref = np.array(rows_ref_values, dtype=np.float64)
+    f_rows_test = f_rows_ref.copy()
+    differing_rows = ~np.array(identical_rows)
+    if rows_test_values:
+        f_rows_test[differing_rows] = np.array(
+            rows_test_values, dtype=np.float64
+        )
+
+    # see if we differ by more than epsilon
+    # (nan and infinite values are considered as differences,
+    # they are all that identical rows can report)
+    different = ~np.isfinite(f_rows_ref)
+    with np.errstate(invalid="ignore"):
+        different[differing_rows] = ~(
+            np.abs(f_rows_ref[differing_rows] - f_rows_test[differing_rows])
+            <= epsilon
+        )
+    for row_index, index in np.argwhere(different):
+        diff = OrderedDict()
+        diff["csv_file"] = csv_ref_file
+        diff["class name"] = class_names[row_index]
+        diff["stat name"] = stat_names[index + 1]
+        diff["baseline_val"] = float(f_rows_ref[row_index, index])
+        diff["test_val"] = float(f_rows_test[row_index, index])
+        csv_differences.append(diff)
     return csv_differences
 
 
+def find_csv_files(root_dir):
+    """
+    Find csv files recursively under a directory
+
+    :param root_dir: directory to search csv files from
+    :return: dict of csv files paths by their path relative to root_dir
+    """
+    csv_files = {}
+    # os.walk lists directories with os.scandir, so files are matched
+    # on their names without any extra stat or pattern matching
+    for dir_path, _, file_names in os.walk(root_dir):
+        rel_dir = os.path.relpath(dir_path, root_dir)
+        for file_name in file_names:
+            if file_name.endswith(".csv"):
+                csv_files[
+                    os.path.normpath(os.path.join(rel_dir, file_name))
+                ] = os.path.join(dir_path, file_name)
+    return csv_files
+
+
 def run(baseline_dir, output_dir, epsilon=1.0e-6):
     """
     Compare output_dir results to baseline_dir ones
@@ -107,38 +159,45 @@ def run(baseline_dir, output_dir, epsilon=1.0e-6):
     :return:
     """
 
-    # Find csv files
-    ext = ".csv"
-    baseline_csv_files = glob.glob(
-        "{}/**/*{}".format(baseline_dir, ext), recursive=True
-    )
-    output_csv_files = glob.glob(
-        "{}/**/*{}".format(output_dir, ext), recursive=True
-    )
-
-    baseline_data = [load_csv(csv_file) for csv_file in baseline_csv_files]
-    test_data = [load_csv(csv_file) for csv_file in output_csv_files]
+    # Find csv files and match baseline and tested ones on their path
+    # relative to their root directory (basenames are not unique between
+    # the stats and snapshots directories)
+    baseline_csv_map = find_csv_files(baseline_dir)
+    output_csv_map = find_csv_files(output_dir)
 
     # before checking values we see if class names (slope range)
     # and stats tested are the same between both versions
-    if len(baseline_data) != len(test_data):
+    if set(baseline_csv_map) != set(output_csv_map):
         raise ValueError(
             "Demcompare tests with baseline: KO. "
-            "Inconsistent CSV files number. \nCSV baseline files: {} \n"
-            "CSV tested output files: {}".format(
-                len(baseline_data), len(test_data)
+            "Inconsistent CSV files. \nCSV baseline files only: {} \n"
+            "CSV tested output files only: {}".format(
+                sorted(set(baseline_csv_map) - set(output_csv_map)),
+                sorted(set(output_csv_map) - set(baseline_csv_map)),
             )
         )
+    baseline_csv_files = [
+        baseline_csv_map[name] for name in sorted(baseline_csv_map)
+    ]
+    output_csv_files = [output_csv_map[name] for name in sorted(output_csv_map)]
 
     # Check csv consistency for each csv file
-    differences = [
-        check_csv(csv_ref, csv_test, csv_file, epsilon)
-        for csv_ref, csv_test, csv_file in zip(
-            baseline_data, test_data, baseline_csv_files
+    # (pairs of csv files are checked in worker processes,
+    # sent by chunks when there are many more files than workers)
+    nb_workers = os.cpu_count() or 1
+    chunksize = max(1, len(baseline_csv_files) // (nb_workers * 4))
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        differences = list(
+            executor.map(
+                check_csv,
+                baseline_csv_files,
+                output_csv_files,
+                repeat(epsilon),
+                chunksize=chunksize,
+            )
         )
-    ]
 
-    if sum(len(diff) for diff in differences) != 0:
+    if any(differences):
         raise ValueError(
             "Demcompare tests with baseline: KO."
             " Invalid results : \n {}".format(differences)
@@ -26,6 +26,7 @@ This module contains functions associated to raster images.
 import copy
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Union
 
 # Third party imports
@@ -52,8 +53,9 @@ def read_image(path: str, band: int = 1) -> np.ndarray:
     :param band: numero of band to extract
     :return: band array
     """
-    img_ds = rasterio.open(path)
-    data = img_ds.read(band)
+    # only the required band is read and the file is closed right after
+    with rasterio.open(path) as img_ds:
+        data = img_ds.read(band)
     return data
 
 
@@ -179,9 +181,9 @@ def read_img(
             - im : 2D (row, col) xarray.DataArray float32
             - trans 1D xarray.DataArray float32
     """
-    img_ds = rasterio.open(img)
-    data = img_ds.read(1)
-    transform = img_ds.transform
+    with rasterio.open(img) as img_ds:
+        data = img_ds.read(1)
+        transform = img_ds.transform
 
     dataset = create_dataset(
         data,
@@ -223,12 +225,13 @@ def create_dataset(
             - im : 2D (row, col) xarray.DataArray float32
     """
 
-    img_ds = rasterio.open(img)
-    georef = img_ds.crs
+    # only metadata are needed here
+    with rasterio.open(img) as img_ds:
+        georef = img_ds.crs
+        meta_nodata = img_ds.nodatavals[0]
 
     # Manage nodata
     if no_data is None:
-        meta_nodata = img_ds.nodatavals[0]
         if meta_nodata is not None:
             no_data = meta_nodata
         else:
@@ -526,13 +529,33 @@ def translate(
     :param y_offset: y offset
     :return translated dataset
     """
-    dataset_translated = copy.copy(dataset)
+    return translate_many([dataset], x_offset, y_offset)[0]
 
-    x_off, y_off = pix_to_coord(dataset["trans"].data, y_offset, x_offset)
-    dataset_translated["trans"].data[0] = x_off
-    dataset_translated["trans"].data[3] = y_off
 
-    return dataset_translated
+def translate_many(
+    datasets: List[xr.Dataset], x_offset: float, y_offset: float
+) -> List[xr.Dataset]:
+    """
+    Modify transform from several datasets with the same offsets.
+    Datasets share the same georef, so the new origin is computed only once.
+
+    :param datasets: list of datasets
+    :param x_offset: x offset
+    :param y_offset: y offset
+    :return translated datasets
+    """
+    # New origin is computed before any modification
+    # (datasets transform arrays may be shared)
+    x_off, y_off = pix_to_coord(datasets[0]["trans"].data, y_offset, x_offset)
+
+    datasets_translated = []
+    for dataset in datasets:
+        dataset_translated = copy.copy(dataset)
+        dataset_translated["trans"].data[0] = x_off
+        dataset_translated["trans"].data[3] = y_off
+        datasets_translated.append(dataset_translated)
+
+    return datasets_translated
 
 
 def translate_to_coregistered_geometry(
@@ -654,6 +677,8 @@ def save_tif(
     """
     Write a Dataset in a tiff file.
     If new_array is set, new_array is used as data.
+    The returned dataset shares its data with the input one,
+    only its input_img attribute is set to the written file.
 
     :param dataset: dataset
     :param filename:  output filename
@@ -712,7 +737,9 @@ def save_tif(
             for dsp in range(1, depth + 1):
                 source_ds.write(data[:, :, dsp - 1], dsp)
 
-    new_dataset = copy.deepcopy(dataset)
+    # shallow copy: the written data is shared with the input dataset,
+    # only attributes are copied so input_img can be updated
+    new_dataset = dataset.copy(deep=False)
     # update dataset input_img with new filename
     new_dataset.attrs["input_img"] = filename
 
@@ -778,8 +805,36 @@ def get_slope(dataset: xr.Dataset, degree: bool = False) -> np.ndarray:
     conv_y = conv_x.transpose()
 
     # Now we do the convolutions :
-    gx = filters.convolve(dataset["im"].data, conv_x, mode="reflect")
-    gy = filters.convolve(dataset["im"].data, conv_y, mode="reflect")
+    # -> by blocks of rows, with a one row margin on each side
+    #    so that blocks results are those of the whole image,
+    #    blocks being spread over a pool of threads
+    img = dataset["im"].data
+    gx = np.empty_like(img)
+    gy = np.empty_like(img)
+    nb_rows = img.shape[0]
+    block_rows = 512
+
+    def convolve_block(first_row: int):
+        """
+        Convolve a block of rows of the image with the x and y kernels
+
+        :param first_row: index of the first row of the block
+        """
+        last_row = min(first_row + block_rows, nb_rows)
+        margin_first_row = max(first_row - 1, 0)
+        block = img[margin_first_row : min(last_row + 1, nb_rows)]
+        kept_rows = slice(
+            first_row - margin_first_row, last_row - margin_first_row
+        )
+        gx[first_row:last_row] = filters.convolve(
+            block, conv_x, mode="reflect"
+        )[kept_rows]
+        gy[first_row:last_row] = filters.convolve(
+            block, conv_y, mode="reflect"
+        )[kept_rows]
+
+    with ThreadPoolExecutor() as executor:
+        list(executor.map(convolve_block, range(0, nb_rows, block_rows)))
 
     # And eventually we do compute tan(slope) and aspect
     tan_slope = np.sqrt((gx / distx) ** 2 + (gy / disty) ** 2) / 8
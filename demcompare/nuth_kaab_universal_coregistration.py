@@ -86,8 +86,9 @@ def nuth_kaab_single_iter(dh, slope, aspect, plot_file=None):
     #   as they will be processed as nan later.
     with np.errstate(divide="ignore", invalid="ignore"):
         target = dh / slope
-    target = target[np.isfinite(dh)]
-    aspect = aspect[np.isfinite(dh)]
+    dh_finite_mask = np.isfinite(dh)
+    target = target[dh_finite_mask]
+    aspect = aspect[dh_finite_mask]
 
     # compute median value of target for different aspect slices
     slice_bounds = np.arange(0, 2 * np.pi, np.pi / 36)
@@ -110,14 +111,18 @@ def nuth_kaab_single_iter(dh, slope, aspect, plot_file=None):
     y = target.ravel()
 
     # remove non-finite values
-    xf = x[(np.isfinite(x)) & (np.isfinite(y))]
-    yf = y[(np.isfinite(x)) & (np.isfinite(y))]
+    finite_mask = np.isfinite(x)
+    finite_mask &= np.isfinite(y)
+    xf = x[finite_mask]
+    yf = y[finite_mask]
 
     # remove outliers
     p1 = np.percentile(yf, 1)
     p99 = np.percentile(yf, 99)
-    xf = xf[(p1 <= yf) & (yf <= p99)]
-    yf = yf[(p1 <= yf) & (yf <= p99)]
+    inliers_mask = p1 <= yf
+    inliers_mask &= yf <= p99
+    xf = xf[inliers_mask]
+    yf = yf[inliers_mask]
 
     # set the first guess
     p0 = (3 * np.std(yf) / (2 ** 0.5), 0, np.mean(yf))
@@ -193,10 +198,9 @@ def nuth_kaab_lib(dsm_dataset, ref_dataset, outdir_plot=None, nb_iters=6):
     coreg_ref = ref_dataset["im"].data
 
     # Display
-    median = np.median(initial_dh[np.isfinite(initial_dh)])
-    nmad_old = 1.4826 * np.median(
-        np.abs(initial_dh[np.isfinite(initial_dh)] - median)
-    )
+    finite_initial_dh = initial_dh[np.isfinite(initial_dh)]
+    median = np.median(finite_initial_dh)
+    nmad_old = 1.4826 * np.median(np.abs(finite_initial_dh - median))
     maxval = 3 * nmad_old
     pl.figure(1, figsize=(7.0, 8.0))
     pl.imshow(initial_dh, vmin=-maxval, vmax=maxval)
@@ -29,7 +29,7 @@ import collections
 import itertools
 import logging
 import os
-from functools import reduce
+from functools import lru_cache
 
 # Third party imports
 import matplotlib
@@ -162,7 +162,7 @@ class Partition:
         self._sets_masks = [
             ~(
                 np.isnan(self.coreg_path["dsm"]["im"].data)
-                * np.isnan(self.coreg_path["ref"]["im"].data)
+                & np.isnan(self.coreg_path["ref"]["im"].data)
             )
         ]
         self._sets_colors = None
@@ -283,19 +283,20 @@ class Partition:
         Set masks for partition.
         """
         if self._sets_masks is None:
+            # masks of every set are stacked in a single
+            # (nb_sets, rows, cols) boolean array per support
             all_masks = []
-            ref_masks = []
-            dsm_masks = []
+            masks_shape = (len(self.sets_labels),) + self.coreg_shape
             if self.sets_indexes_ref:
+                ref_masks = np.zeros(masks_shape, dtype=bool)
                 for label_idx in range(len(self.sets_labels)):
-                    ref_masks.append(np.ones(self.coreg_shape) * False)
                     ref_masks[label_idx][
                         self.sets_indexes_ref[label_idx]
                     ] = True
                 all_masks.append(ref_masks)
             if self.sets_indexes_dsm:
+                dsm_masks = np.zeros(masks_shape, dtype=bool)
                 for label_idx in range(len(self.sets_labels)):
-                    dsm_masks.append(np.ones(self.coreg_shape) * False)
                     dsm_masks[label_idx][
                         self.sets_indexes_dsm[label_idx]
                     ] = True
@@ -390,30 +391,27 @@ class Partition:
         """
         # use radiometric ranges to classify
         slope = read_img(slope_img, load_data=False)
+        slope_data = slope["im"].data
         rad_range = list(self.classes.values())
         map_img = read_img_from_array(
-            np.ones(slope["im"].data.shape) * self.nodata,
+            np.full(slope_data.shape, self.nodata, dtype=np.float32),
             from_dataset=slope,
             no_data=self.nodata,
         )
         map_img = save_tif(map_img, self.ref_path)
 
-        for idx, _ in enumerate(rad_range):
-            if idx == len(rad_range) - 1:
-                map_img["im"].data[
-                    np.where(
-                        (~np.isnan(slope["im"].data))
-                        * (slope["im"].data >= rad_range[idx])
-                    )
-                ] = rad_range[idx]
-            else:
-                map_img["im"].data[
-                    np.where(
-                        (~np.isnan(slope["im"].data))
-                        * (slope["im"].data >= rad_range[idx])
-                        & (slope["im"].data < rad_range[idx + 1])
-                    )
-                ] = rad_range[idx]
+        # get the class index of every pixel in a single pass:
+        # rad_range[idx] <= value < rad_range[idx + 1] gives idx,
+        # values below the first range give -1
+        class_idx = np.digitize(slope_data, rad_range) - 1
+        # nan (and so nodata) pixels are not classified
+        class_idx[np.isnan(slope_data)] = -1
+
+        # paint every pixel with its range minimum value in a single take
+        # from a lookup table whose last entry (index -1) is the nan
+        # the map was initialized with
+        ranges_lut = np.array(rad_range + [np.nan], dtype=np.float32)
+        map_img["im"].data[...] = ranges_lut[class_idx]
 
         self.map_path[type_slope] = os.path.join(
             self.stats_dir, type_slope + "_support_map.tif"
@@ -652,7 +650,7 @@ class FusionPartition(Partition):
             self.dict_fusion.items()
         ):  # df_k is 'ref' or 'dsm' and df_v is 'True' or 'False'
             if df_v:
-                map_fusion = np.ones(self._coreg_shape) * -32768.0
+                map_fusion = np.full(self._coreg_shape, -32768.0)
                 for label_idx, label_name in enumerate(self.sets_labels):
                     map_fusion[
                         self._sets_indexes[df_k][label_idx]
@@ -692,30 +690,28 @@ class FusionPartition(Partition):
         ):  # df_k is 'ref' or 'dsm' and df_v is 'True' or 'False'
             if df_v:
                 self._sets_indexes[df_k] = []
+                # boolean mask of every couple (partition layer, label index),
+                # built once as couples appear in several merged labels
+                labels_masks = {}
                 for combi in all_combi_labels:
-                    # following list will contain indexes for couple
-                    # (partition layer, label index) for this merged label
-                    all_indexes = []
+                    # merge indexes of the couples of this merged label :
+                    # their masks are ANDed together
+                    merged_mask = np.ones(self._coreg_shape, dtype=bool)
                     for elm in combi:
                         layer_name = elm[0]
                         label_idx = elm[1]
-                        all_indexes.append(
-                            dict_partitions[layer_name]._sets_indexes[df_k][
-                                label_idx
-                            ]
-                        )
-
-                    # ravel indexes so we can merge them
-                    all_indexes = [
-                        np.ravel_multi_index(indexes2D, self._coreg_shape)
-                        for indexes2D in all_indexes
-                    ]
-
-                    # merge indexes and unravel them
-                    merged_indexes = reduce(np.intersect1d, all_indexes)
-                    self._sets_indexes[df_k].append(
-                        np.unravel_index(merged_indexes, self._coreg_shape)
-                    )
+                        if (layer_name, label_idx) not in labels_masks:
+                            label_mask = np.zeros(self._coreg_shape, dtype=bool)
+                            label_mask[
+                                dict_partitions[layer_name]._sets_indexes[df_k][
+                                    label_idx
+                                ]
+                            ] = True
+                            labels_masks[(layer_name, label_idx)] = label_mask
+                        merged_mask &= labels_masks[(layer_name, label_idx)]
+
+                    # indexes are given in increasing raveled order
+                    self._sets_indexes[df_k].append(np.nonzero(merged_mask))
 
     @staticmethod
     def _create_merged_classes(partitions):
@@ -758,9 +754,12 @@ class FusionPartition(Partition):
         return all_combi_labels, new_classes
 
 
+@lru_cache(maxsize=None)
 def get_color(nb_color=10):
     """
     Function to get matplotlib color possibilities.
+    Colors are computed once for each number of colors and cached,
+    hence the returned array is read-only.
     """
 
     if 10 < nb_color < 21:
@@ -777,11 +776,13 @@ def get_color(nb_color=10):
             x = mpl_pyplot.cm.get_cmap("Vega10")
     if nb_color > 20:
         clr = mpl_pyplot.cm.get_cmap("gist_earth")
-        return np.array(
+        colors = np.array(
             [clr(c / float(nb_color))[0:3] for c in np.arange(nb_color)]
         )
-    # else:
-    return np.array(x.colors[0:nb_color])
+    else:
+        colors = np.array(x.colors[0:nb_color])
+    colors.flags.writeable = False
+    return colors
 
 
 def create_fusion(sets_masks, all_combi_labels, classes_fusion, layers_obj):
@@ -794,29 +795,30 @@ def create_fusion(sets_masks, all_combi_labels, classes_fusion, layers_obj):
     :return:
     """
     # create map which fusion all classes combinaisons
-    map_fusion = np.ones(layers_obj.r.shape) * -32768.0
+    map_fusion = np.full(layers_obj.r.shape, -32768.0)
     sets_fusion = []
     sets_colors = np.multiply(get_color(len(all_combi_labels)), 255)
     # get masks associated with tuples
     for combi in all_combi_labels:
-        mask_fusion = np.ones(layers_obj.r.shape)
+        mask_fusion = np.ones(layers_obj.r.shape, dtype=bool)
         for elm_combi in combi:
             layer_name = elm_combi[0]
             label_name = elm_combi[1]
             # concatenate masks of different labels
             # from tuple/combinaison in mask_fusion
-            mask_label = np.zeros(layers_obj.r.shape)
-            mask_label[sets_masks[layer_name][label_name]] = 1
+            mask_label = np.zeros(layers_obj.r.shape, dtype=bool)
+            mask_label[sets_masks[layer_name][label_name]] = True
             # TODO change sets_masks[layer_name]['sets_def'][label_name]
             # dict is not the same anymore => a list now
-            mask_fusion = mask_fusion * mask_label
+            mask_fusion &= mask_label
 
         # get new label associated in new_classes dict
         new_label_name = "&".join(["@".join(elm_combi) for elm_combi in combi])
         new_label_value = classes_fusion[new_label_name]
-        map_fusion[np.where(mask_fusion)] = new_label_value
+        fusion_indexes = np.where(mask_fusion)
+        map_fusion[fusion_indexes] = new_label_value
         # save mask_fusion
-        sets_fusion.append((new_label_name, np.where(mask_fusion)))
+        sets_fusion.append((new_label_name, fusion_indexes))
 
     # save map fusion
     map_return = read_img_from_array(
@@ -24,14 +24,14 @@ for stats computation and plot viewing
 """
 
 # Standard imports
-import collections
-import copy
 import csv
 import json
 import logging
 import math
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
 import matplotlib as mpl
 import matplotlib.pyplot as mpl_pyplot
@@ -47,6 +47,34 @@ from .img_tools import read_image, read_img_from_array, save_tif
 from .output_tree_design import get_out_file_path
 from .partition import FusionPartition, NotEnoughDataToPartitionError, Partition
 
+# Stats saved as csv: csv extended fieldnames and associated stats keys
+CSV_FIELDNAMES = (
+    "Set Name",
+    "% Of Valid Points",
+    "Max Error",
+    "Min Error",
+    "Mean Error",
+    "Error std",
+    "RMSE",
+    "Median Error",
+    "NMAD",
+    "90 percentile",
+)
+CSV_STATS_KEYS = (
+    "set_name",
+    "%",
+    "max",
+    "min",
+    "mean",
+    "std",
+    "rmse",
+    "median",
+    "nmad",
+    "90p",
+)
+# csv row of a set stats, with its values picked in a single call
+get_csv_stats_row = itemgetter(*CSV_STATS_KEYS)
+
 
 class NoPointsToPlot(Exception):
     pass
@@ -128,7 +156,8 @@ def compute_stats_array(
 
 
 def gaus(x, a, x_zero, sigma):
-    return a * np.exp(-((x - x_zero) ** 2) / (2 * sigma ** 2))
+    deviation = x - x_zero
+    return a * np.exp(-(deviation * deviation) / (2 * sigma * sigma))
 
 
 def round_up(x, y):
@@ -143,12 +172,12 @@ def get_nonan_mask(array, no_data_value=None):
     :no_data_value: no data value considered. Default: None
     :return: nan and no_data_value if exists mask on array.
     """
-    if no_data_value is None:
-        return np.apply_along_axis(lambda x: (~np.isnan(x)), 0, array)
-    # else no_data_value exists
-    return np.apply_along_axis(
-        lambda x: (~np.isnan(x)) * (x != no_data_value), 0, array
-    )
+    # invalid pixels are flagged in a single mask, updated in place,
+    # which is then inverted in place
+    invalid_mask = np.isnan(array)
+    if no_data_value is not None:
+        np.logical_or(invalid_mask, array == no_data_value, out=invalid_mask)
+    return np.logical_not(invalid_mask, out=invalid_mask)
 
 
 def get_outliers_free_mask(array, no_data_value=None):
@@ -161,14 +190,19 @@ def get_outliers_free_mask(array, no_data_value=None):
     :param no_data_value: value of no data to consider. Default(None)
     :return: outliers free mask (array of True where value is no outlier)
     """
-    # pylint: disable=singleton-comparison
     no_data_free_mask = get_nonan_mask(array, no_data_value)
-    array_without_nan = array[np.where(no_data_free_mask == True)]  # noqa: E712
-    mu = np.mean(array_without_nan)
-    sigma = np.std(array_without_nan)
-    return np.apply_along_axis(
-        lambda x: (x > mu - 3 * sigma) * (x < mu + 3 * sigma), 0, array
+    array_without_nan = array[no_data_free_mask]
+    # mu and sigma from the sum and the sum of squares
+    # accumulated in float64 (instead of np.mean then np.std passes)
+    nb_values = array_without_nan.size
+    mu = np.sum(array_without_nan, dtype=np.float64) / nb_values
+    sum_of_squares = np.einsum(
+        "i,i->", array_without_nan, array_without_nan, dtype=np.float64
     )
+    sigma = math.sqrt(max(sum_of_squares / nb_values - mu * mu, 0.0))
+    outliers_free_mask = array > mu - 3 * sigma
+    outliers_free_mask &= array < mu + 3 * sigma
+    return outliers_free_mask
 
 
 def create_mode_masks(alti_map, partitions_sets_masks=None):
@@ -190,7 +224,7 @@ def create_mode_masks(alti_map, partitions_sets_masks=None):
 
     :param alti_map: xarray Dataset, alti differences
     :param partitions_sets_masks: [] (master and/or slave dsm)
-        of [] of boolean array (sets for each dsm)
+        of stacked boolean arrays (sets for each dsm)
     :return: list of masks, associated modes, and error_img read as array
     """
 
@@ -211,7 +245,9 @@ def create_mode_masks(alti_map, partitions_sets_masks=None):
             # np.any return True for a pixel
             # if it belongs to at least one set (=it this is not a nodata pixel)
             partition_nonan_mask = np.any(partition_img, axis=0)
-            mode_masks[0] *= partition_nonan_mask
+            np.logical_and(
+                mode_masks[0], partition_nonan_mask, out=mode_masks[0]
+            )
 
     # Carrying on with potentially
     # the cross classification (coherent & incoherent) masks
@@ -221,23 +257,21 @@ def create_mode_masks(alti_map, partitions_sets_masks=None):
         mode_names.append("coherent-classification")
         # Combine pairs of sets together
         # (meaning first partition first set with second partition first set)
-        # -> then for each single class / set,
-        #    we know which pixels are coherent between both partitions
-        # -> combine_sets[0].shape[0] = number of sets (classes)
-        # -> combine_sets[0].shape[1] = number of pixels inside a single DSM
+        # -> a pixel is incoherent as soon as it belongs to a set
+        #    for one partition and not for the other one
+        # -> incoherences are accumulated set after set
+        #    so that only one pixel sized mask is kept
         partition_imgs = partitions_sets_masks
-        combine_sets = np.array(
-            [
-                partition_imgs[0][set_idx][:] == partition_imgs[1][set_idx][:]
-                for set_idx in range(0, len(partition_imgs[0]))
-            ]
-        )
-        coherent_mask = np.all(combine_sets, axis=0)
-        mode_masks.append(mode_masks[0] * coherent_mask)
+        incoherent_mask = np.zeros(partition_imgs[0][0].shape, dtype=bool)
+        for ref_set, dsm_set in zip(partition_imgs[0], partition_imgs[1]):
+            np.logical_or(
+                incoherent_mask, ref_set != dsm_set, out=incoherent_mask
+            )
+        mode_masks.append(mode_masks[0] & ~incoherent_mask)
 
         # Then the incoherent one
         mode_names.append("incoherent-classification")
-        mode_masks.append(mode_masks[0] * ~coherent_mask)
+        mode_masks.append(mode_masks[0] & incoherent_mask)
 
     return mode_masks, mode_names
 
@@ -277,22 +311,26 @@ def create_masks(
 
     modes = []
     masks = []
+    alti_data = alti_map["im"].data
+    alti_no_data = alti_map.attrs["no_data"]
 
     # Starting with the 'standard' mask with no nan values
     modes.append("standard")
-    masks.append(get_nonan_mask(alti_map["im"].data, alti_map.attrs["no_data"]))
+    masks.append(get_nonan_mask(alti_data, alti_no_data))
 
     # Create no outliers mask if required
     no_outliers = None
     if remove_outliers:
-        no_outliers = get_outliers_free_mask(
-            alti_map["im"].data, alti_map.attrs["no_data"]
-        )
+        no_outliers = get_outliers_free_mask(alti_data, alti_no_data)
 
     # If the classification is on then we also consider ref_support nan values
     if do_classification:
-        masks[0] *= get_nonan_mask(
-            ref_support["im"].data, ref_support.attrs["no_data"]
+        np.logical_and(
+            masks[0],
+            get_nonan_mask(
+                ref_support["im"].data, ref_support.attrs["no_data"]
+            ),
+            out=masks[0],
         )
 
     # Carrying on with potentially the cross classification masks
@@ -307,11 +345,11 @@ def create_masks(
         coherent_mask = get_nonan_mask(
             ref_support_classified_val, ref_support_classified_desc["nodata"][0]
         )
-        masks.append(masks[0] * coherent_mask)
+        masks.append(masks[0] & coherent_mask)
 
         # Then the incoherent one
         modes.append("incoherent-classification")
-        masks.append(masks[0] * ~coherent_mask)
+        masks.append(masks[0] & ~coherent_mask)
 
     return masks, modes, no_outliers
 
@@ -320,25 +358,38 @@ def stats_computation(array, list_threshold=None):
     """
     Compute stats for a specific array
 
-    :param array: numpy array
+    :param array: numpy array, without nan values
     :param list_threshold: list, defines thresholds to be used
         for pixels above thresholds ratio computation
     :return: dict with stats name and values
     """
     if array.size:
+        # Sums, mean and median are computed once and reused
+        # (divisions keep the array dtype as np.mean and np.std do)
+        sum_err = np.sum(array)
+        sum_err_err = np.sum(array * array)
+        mean = sum_err.dtype.type(sum_err / array.size)
+        deviations = array - mean
+        median = np.median(array)
         res = {
             "nbpts": array.size,
             "max": float(np.max(array)),
             "min": float(np.min(array)),
-            "mean": float(np.mean(array)),
-            "std": float(np.std(array)),
-            "rmse": float(np.sqrt(np.mean(array * array))),
-            "median": float(np.nanmedian(array)),
-            "nmad": float(
-                1.4826 * np.nanmedian(np.abs(array - np.nanmedian(array)))
+            "mean": float(mean),
+            "std": float(
+                np.sqrt(
+                    sum_err_err.dtype.type(
+                        np.sum(deviations * deviations) / array.size
+                    )
+                )
             ),
-            "sum_err": float(np.sum(array)),
-            "sum_err.err": float(np.sum(array * array)),
+            "rmse": float(
+                np.sqrt(sum_err_err.dtype.type(sum_err_err / array.size))
+            ),
+            "median": float(median),
+            "nmad": float(1.4826 * np.median(np.abs(array - median))),
+            "sum_err": float(sum_err),
+            "sum_err.err": float(sum_err_err),
         }
         if list_threshold:
             res["ratio_above_threshold"] = {
@@ -370,6 +421,26 @@ def stats_computation(array, list_threshold=None):
     return res
 
 
+def create_sets_idx_map(sets, shape):
+    """
+    Encode sets, as a partition of all values, in a map of set indices.
+    Pixels out of every set get the index len(sets).
+
+    :param sets: stacked sets
+        (boolean arrays that indicate which class a pixel belongs to)
+    :param shape: shape of the sets
+    :return: map of set indices, None if sets overlap
+    """
+    nb_sets = len(sets)
+    sets_idx_map = np.full(shape, nb_sets, dtype=np.min_scalar_type(nb_sets))
+    for set_idx, set_mask in enumerate(sets):
+        sets_idx_map[set_mask] = set_idx
+    if np.count_nonzero(sets_idx_map != nb_sets) != np.count_nonzero(sets):
+        # sets overlap, they can not be encoded in a single map
+        return None
+    return sets_idx_map
+
+
 def get_stats(
     dz_values,
     to_keep_mask=None,
@@ -378,32 +449,37 @@ def get_stats(
     sets_names=None,
     list_threshold=None,
     outliers_free_mask=None,
+    sets_idx_map=None,
 ):
     """
     Get Stats for a specific array, considering potentially subsets of it
 
     :param dz_values: errors
     :param to_keep_mask: boolean mask with True values for pixels to use
+        (nan pixels are expected to be masked)
     :param sets: list of sets
         (boolean arrays that indicate which class a pixel belongs to)
     :param sets_labels: label associated to the sets
     :param sets_names: name associated to the sets
     :param list_threshold: list, defines thresholds to be used
         for pixels above thresholds ratio computation
+    :param outliers_free_mask: boolean mask with True values for pixels
+        that are not outliers
+    :param sets_idx_map: sets encoded by create_sets_idx_map,
+        computed from sets if not given
     :return: list of dictionary
         (set_name, nbpts, %(out_of_all_pts), max, min, mean, std, rmse, ...)
     """
-    # pylint: disable=singleton-comparison
 
     def nighty_percentile(array):
         """
         Compute the maximal error for the 90% smaller errors
 
-        :param array:
+        :param array: errors, without nan values (as masks remove them)
         :return:
         """
         if array.size:
-            return np.nanpercentile(np.abs(array - np.nanmean(array)), 90)
+            return np.percentile(np.abs(array - np.mean(array)), 90)
         # else:
         return np.nan
 
@@ -413,21 +489,19 @@ def get_stats(
     # - if a mask is not set,
     # we set it with True values only so that it has no effect
     if to_keep_mask is None:
-        to_keep_mask = np.ones(dz_values.shape)
+        to_keep_mask = np.ones(dz_values.shape, dtype=bool)
     if outliers_free_mask is None:
-        outliers_free_mask = np.ones(dz_values.shape)
+        outliers_free_mask = np.ones(dz_values.shape, dtype=bool)
+
+    # Pixels kept and outliers free, shared by all sets
+    kept_outliers_free_mask = to_keep_mask & outliers_free_mask
+    kept_outliers_free_values = dz_values[kept_outliers_free_mask]
+    kept_values = dz_values[to_keep_mask]
 
     # Computing first set of values with all pixels considered
     # -except the ones masked or the outliers-
     output_list.append(
-        stats_computation(
-            dz_values[
-                np.where(
-                    to_keep_mask * outliers_free_mask == True  # noqa: E712
-                )
-            ],
-            list_threshold,
-        )
+        stats_computation(kept_outliers_free_values, list_threshold)
     )
     # - we add standard information for later use
     output_list[0]["set_label"] = "all"
@@ -437,31 +511,68 @@ def get_stats(
     )
     # - we add computation of nighty percentile
     # (of course we keep outliers for that so we use dz_values as input array)
-    output_list[0]["90p"] = nighty_percentile(
-        dz_values[np.where(to_keep_mask == True)]  # noqa: E712
-    )
+    output_list[0]["90p"] = nighty_percentile(kept_values)
+
+    if sets is None or sets_labels is None or sets_names is None:
+        return output_list
+
+    # Sets are expected to be a partition of all values :
+    # they are then encoded once as a map of set indices
+    nb_sets = len(sets)
+    if sets_idx_map is None:
+        sets_idx_map = create_sets_idx_map(sets, dz_values.shape)
+
+    def split_by_set(values, values_mask):
+        """
+        Split values, picked from dz_values with values_mask, by set
+
+        :param values: dz_values[values_mask]
+        :param values_mask: boolean mask the values were picked with
+        :return: list of the values of every set, in their original order
+        """
+        if sets_idx_map is None:
+            return [dz_values[set_mask & values_mask] for set_mask in sets]
+        # values are grouped by set with a stable sort of their set indices
+        # so that every set values are a contiguous slice of them
+        values_sets_idx = sets_idx_map[values_mask]
+        sorted_values = values[np.argsort(values_sets_idx, kind="stable")]
+        sets_ends = np.cumsum(
+            np.bincount(values_sets_idx, minlength=nb_sets + 1)
+        )
+        return np.split(sorted_values, sets_ends[:nb_sets])[:nb_sets]
+
+    def set_stats(set_idx, set_values, set_kept_values):
+        """
+        Compute the stats of one set
+
+        :param set_idx: index of the set
+        :param set_values: set values, kept and outliers free
+        :param set_kept_values: set values, kept
+        :return: dictionary of the set stats
+        """
+        set_output = stats_computation(set_values, list_threshold)
+        set_output["set_label"] = sets_labels[set_idx]
+        set_output["set_name"] = sets_names[set_idx]
+        set_output["%"] = (
+            100 * float(set_output["nbpts"]) / float(nb_total_points)
+        )
+        set_output["90p"] = nighty_percentile(set_kept_values)
+        return set_output
 
     # Computing stats for all sets (sets are a partition of all values)
-    if sets is not None and sets_labels is not None and sets_names is not None:
-        for set_idx, _ in enumerate(sets):
-            set_item = sets[set_idx] * to_keep_mask * outliers_free_mask
-
-            data = dz_values[np.where(set_item == True)]  # noqa: E712
-            output_list.append(stats_computation(data, list_threshold))
-            output_list[set_idx + 1]["set_label"] = sets_labels[set_idx]
-            output_list[set_idx + 1]["set_name"] = sets_names[set_idx]
-            output_list[set_idx + 1]["%"] = (
-                100
-                * float(output_list[set_idx + 1]["nbpts"])
-                / float(nb_total_points)
-            )
-            output_list[set_idx + 1]["90p"] = nighty_percentile(
-                dz_values[
-                    np.where(
-                        (sets[set_idx] * to_keep_mask) == True  # noqa: E712
-                    )
-                ]
+    # -> sets are independent and numpy releases the GIL
+    #    in its reductions so they are computed by a pool of threads
+    with ThreadPoolExecutor() as executor:
+        output_list.extend(
+            executor.map(
+                set_stats,
+                range(nb_sets),
+                split_by_set(
+                    kept_outliers_free_values, kept_outliers_free_mask
+                ),
+                split_by_set(kept_values, to_keep_mask),
             )
+        )
 
     return output_list
 
@@ -478,14 +589,15 @@ def dem_diff_plot(dem_diff, title="", plot_file="dem_diff.png", display=False):
         otherwise the plot is saved to plot_file location
     """
     # Init mu and sigma from data to focus on little values
-    mu = np.nanmean(dem_diff["im"].data)
-    sigma = np.nanstd(dem_diff["im"].data)
+    dem_diff_data = dem_diff["im"].data
+    mu = np.nanmean(dem_diff_data)
+    sigma = np.nanstd(dem_diff_data)
 
     # Plot
     fig, fig_ax = mpl_pyplot.subplots(figsize=(7.0, 8.0))
     fig_ax.set_title(title, fontsize="large")
     im1 = fig_ax.imshow(
-        dem_diff["im"].data, cmap="terrain", vmin=mu - sigma, vmax=mu + sigma
+        dem_diff_data, cmap="terrain", vmin=mu - sigma, vmax=mu + sigma
     )
     fig.colorbar(im1, label="Elevation differences (m)")
     fig.text(
@@ -625,7 +737,6 @@ def plot_histograms(  # noqa: C901
     :param plot_real_hist: plot or save (see display param) real histograms
     :return: list saved files
     """
-    # pylint: disable=singleton-comparison
 
     saved_files = []
     saved_labels = []
@@ -641,24 +752,10 @@ def plot_histograms(  # noqa: C901
     # -> bins should rely on [-A;A],A being the higher absolute error value
     # (all histograms rely on the same bins range)
     if to_keep_mask is not None:
-        if input_array[np.where(to_keep_mask == True)].size != 0:  # noqa: E712
+        kept_values = input_array[to_keep_mask]
+        if kept_values.size != 0:
             borne = np.max(
-                [
-                    abs(
-                        np.nanmin(
-                            input_array[
-                                np.where(to_keep_mask == True)  # noqa: E712
-                            ]
-                        )
-                    ),
-                    abs(
-                        np.nanmax(
-                            input_array[
-                                np.where(to_keep_mask == True)  # noqa: E712
-                            ]
-                        )
-                    ),
-                ]
+                [abs(np.nanmin(kept_values)), abs(np.nanmax(kept_values))]
             )
         else:
             raise NoPointsToPlot
@@ -686,17 +783,12 @@ def plot_histograms(  # noqa: C901
         fig1_ax.set_xlabel("Errors (meter)")
         data = []
         full_color = []
-        for set_idx, _ in enumerate(sets):
+        for set_idx, set_mask in enumerate(sets):
             # -> restricts to input data
+            # (without modifying the caller sets)
             if to_keep_mask is not None:
-                sets[set_idx] = sets[set_idx] * to_keep_mask
-            # print(
-            #     "}}}}}}}}}}}}}}}}}}}}}}}}}}}}}} plot_histograms() : ",
-            #     np.where(sets[set_idx] == True),  # noqa: E712
-            # )
-            data.append(
-                input_array[np.where(sets[set_idx] == True)]  # noqa: E712
-            )
+                set_mask = set_mask & to_keep_mask
+            data.append(input_array[set_mask])
             full_color.append(sets_colors[set_idx])
         fig1_ax.hist(
             data,
@@ -744,11 +836,21 @@ def plot_histograms(  # noqa: C901
     cumulative_percent = 0
     set_zero_size = 0
     if sets is not None and sets_labels is not None and sets_colors is not None:
-        for set_idx, _ in enumerate(sets):
+        # Bin index of every pixel is computed once for all sets
+        # (as np.histogram does, the last bin is closed on the right
+        # and values out of the bins range or nan are left aside
+        # in an extra bin which is not counted)
+        nb_bins = bins.size - 1
+        bins_idx = np.searchsorted(bins, input_array, side="right") - 1
+        bins_idx[input_array == bins[-1:]] = nb_bins - 1
+        bins_idx[bins_idx < 0] = nb_bins
+        bins_widths = np.diff(bins)
+        for set_idx, set_mask in enumerate(sets):
             # -> restricts to input data
+            # (without modifying the caller sets)
             if to_keep_mask is not None:
-                sets[set_idx] = sets[set_idx] * to_keep_mask
-            data = input_array[np.where(sets[set_idx] == True)]  # noqa: E712
+                set_mask = set_mask & to_keep_mask
+            data = input_array[set_mask]
 
             # -> empty data is not plotted
             if data.size:
@@ -765,26 +867,40 @@ def plot_histograms(  # noqa: C901
                 else:
                     set_zero_size = data.size
 
-                try:
-                    n, bins = np.histogram(data, bins=bins, density=True)
-                    fit_result = curve_fit(
-                        gaus,
-                        bins[0 : bins.shape[0] - 1] + int(bin_step / 2),
-                        n,
-                        p0=[1, mean, std],
+                # Density histogram, computed as np.histogram does
+                counts = np.bincount(bins_idx[set_mask], minlength=nb_bins + 1)
+                counts = counts[:nb_bins]
+                n = counts / bins_widths / counts.sum()
+                if std > 0:
+                    # The gaussian is fitted on the normalized histogram
+                    # starting from the maximum likelihood one : it has
+                    # the data mean and std (and is normalized as well)
+                    moments_popt = [
+                        1 / (std * math.sqrt(2 * math.pi)),
+                        mean,
+                        std,
+                    ]
+                    try:
+                        fit_result = curve_fit(
+                            gaus,
+                            bins[0 : bins.shape[0] - 1] + int(bin_step / 2),
+                            n,
+                            p0=moments_popt,
+                        )
+                        # get popt and avoid unbalanced-tuple-unpacking message
+                        popt, _ = fit_result[:2]
+                    except RuntimeError:
+                        print(
+                            "Gaussian plotted from errors mean and std "
+                            "as curve_fit failed to converge"
+                        )
+                        popt = moments_popt
+                    gaus_x = np.arange(
+                        bins[0], bins[bins.shape[0] - 1], bin_step / 10
                     )
-                    # get popt and avoid unbalanced-tuple-unpacking message
-                    popt, _ = fit_result[:2]
                     fig2_ax_errors.plot(
-                        np.arange(
-                            bins[0], bins[bins.shape[0] - 1], bin_step / 10
-                        ),
-                        gaus(
-                            np.arange(
-                                bins[0], bins[bins.shape[0] - 1], bin_step / 10
-                            ),
-                            *popt
-                        ),
+                        gaus_x,
+                        gaus(gaus_x, *popt),
                         color=sets_colors[set_idx],
                         linewidth=1,
                         label=" ".join(
@@ -796,29 +912,29 @@ def plot_histograms(  # noqa: C901
                             ]
                         ),
                     )
-                    if set_idx != 0:
-                        # 1 is the x location and 0.05 is the width
-                        # (label is not printed)
-                        fig2_ax_classes.bar(
-                            1,
-                            set_contribution,
-                            0.05,
-                            color=sets_colors[set_idx],
-                            bottom=cumulative_percent - set_contribution,
-                            label="test",
-                        )
-
-                        fig2_ax_classes.text(
-                            1,
-                            cumulative_percent - 0.5 * set_contribution,
-                            "{0:.2f}".format(set_contribution),
-                            weight="bold",
-                            horizontalalignment="left",
-                        )
-                except RuntimeError:
+                else:
                     print(
                         "No fitted gaussian plot "
-                        "created as curve_fit failed to converge"
+                        "created as errors have a null standard deviation"
+                    )
+                if set_idx != 0:
+                    # 1 is the x location and 0.05 is the width
+                    # (label is not printed)
+                    fig2_ax_classes.bar(
+                        1,
+                        set_contribution,
+                        0.05,
+                        color=sets_colors[set_idx],
+                        bottom=cumulative_percent - set_contribution,
+                        label="test",
+                    )
+
+                    fig2_ax_classes.text(
+                        1,
+                        cumulative_percent - 0.5 * set_contribution,
+                        "{0:.2f}".format(set_contribution),
+                        weight="bold",
+                        horizontalalignment="left",
                     )
 
                 # save outputs (plot files and name of labels kept)
@@ -877,33 +993,37 @@ def save_results(
     :return:
     """
 
+    # index of every plotted label (its first one as labels_plotted.index)
+    labels_plotted_idx = {}
+    if (
+        labels_plotted is not None
+        and plot_files is not None
+        and plot_colors is not None
+    ):
+        for label_idx, label in enumerate(labels_plotted):
+            labels_plotted_idx.setdefault(label, label_idx)
+
     results = {}
     for stats_index, stats_elem in enumerate(stats_list):
         results[str(stats_index)] = stats_elem
-        if (
-            labels_plotted is not None
-            and plot_files is not None
-            and plot_colors is not None
-        ):
-            if stats_elem["set_label"] in labels_plotted:
-                try:
-                    results[str(stats_index)]["plot_file"] = plot_files[
-                        labels_plotted.index(stats_elem["set_label"])
-                    ]
-                    results[str(stats_index)]["plot_color"] = tuple(
-                        plot_colors[
-                            labels_plotted.index(stats_elem["set_label"])
-                        ]
-                    )
-                except Exception:
-                    print(
-                        "Error: plot_files and plot_colors "
-                        "should have same dimension as labels_plotted"
-                    )
-                    raise
+        if stats_elem["set_label"] in labels_plotted_idx:
+            label_idx = labels_plotted_idx[stats_elem["set_label"]]
+            try:
+                results[str(stats_index)]["plot_file"] = plot_files[label_idx]
+                results[str(stats_index)]["plot_color"] = tuple(
+                    plot_colors[label_idx]
+                )
+            except Exception:
+                print(
+                    "Error: plot_files and plot_colors "
+                    "should have same dimension as labels_plotted"
+                )
+                raise
 
-    with open(output_json_file, "w") as outfile:
-        json.dump(results, outfile, indent=4)
+    # results are encoded at once and written in a single call
+    # (files are written through a 1 MiB buffer)
+    with open(output_json_file, "w", buffering=1 << 20) as outfile:
+        outfile.write(json.dumps(results, indent=4))
 
     if to_csv:
         # Print the merged results into a csv file
@@ -912,31 +1032,12 @@ def save_results(
         csv_filename = os.path.join(
             os.path.splitext(output_json_file)[0] + ".csv"
         )
-        # - fill csv_results with solely the filed required
-        csv_results = collections.OrderedDict()
-        for set_idx in range(0, len(results)):
-            key = str(set_idx)
-            csv_results[key] = collections.OrderedDict()
-            csv_results[key]["Set Name"] = results[key]["set_name"]
-            csv_results[key]["% Of Valid Points"] = results[key]["%"]
-            csv_results[key]["Max Error"] = results[key]["max"]
-            csv_results[key]["Min Error"] = results[key]["min"]
-            csv_results[key]["Mean Error"] = results[key]["mean"]
-            csv_results[key]["Error std"] = results[key]["std"]
-            csv_results[key]["RMSE"] = results[key]["rmse"]
-            csv_results[key]["Median Error"] = results[key]["median"]
-            csv_results[key]["NMAD"] = results[key]["nmad"]
-            csv_results[key]["90 percentile"] = results[key]["90p"]
         # - writes the results down as csv format
-        with open(csv_filename, "w") as csvfile:
-            fieldnames = list(csv_results["0"].keys())
-            writer = csv.DictWriter(
-                csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_NONNUMERIC
-            )
-
-            writer.writeheader()
-            for set_item in csv_results:
-                writer.writerow(csv_results[set_item])
+        #   with solely the fields required, one row per set
+        with open(csv_filename, "w", newline="", buffering=1 << 20) as csvfile:
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_NONNUMERIC)
+            writer.writerow(CSV_FIELDNAMES)
+            writer.writerows(map(get_csv_stats_row, results.values()))
 
 
 def create_partitions(dsm, ref, output_dir, stats_opts, geo_ref=True):
@@ -1146,12 +1247,13 @@ def alti_diff_stats(
         return list_threshold_m
 
     # Get outliers free mask (array of True where value is no outlier)
+    alti_data = alti_map["im"].data
     if remove_outliers:
         outliers_free_mask = get_outliers_free_mask(
-            alti_map["im"].data, alti_map.attrs["no_data"]
+            alti_data, alti_map.attrs["no_data"]
         )
     else:
-        outliers_free_mask = 1
+        outliers_free_mask = np.ones(alti_data.shape, dtype=bool)
 
     # There can be multiple ways to partition the stats.
     # We gather them all inside a list here:
@@ -1159,32 +1261,31 @@ def alti_diff_stats(
         dsm, ref, cfg["outputDir"], cfg["stats_opts"], geo_ref=geo_ref
     )
 
-    # For every partition get stats and save them as plots and tables
-    cfg["stats_results"]["partitions"] = {}
-    for p in partitions:
-        # Compute stats for each mode and every sets
-        mode_stats, mode_masks, mode_names = get_stats_per_mode(
-            alti_map,
-            sets_masks=p.sets_masks,
-            sets_labels=p.sets_labels,
-            sets_names=p.sets_names,
-            elevation_thresholds=get_thresholds_in_meters(cfg),
-            outliers_free_mask=outliers_free_mask,
-        )
+    # Plot title and thresholds are the same for every partition
+    plot_title = "\n".join(get_title(cfg))
+    elevation_thresholds = get_thresholds_in_meters(cfg)
+
+    def save_partition_stats(p, mode_stats, mode_masks, mode_names):
+        """
+        Save stats of a partition as plots, csv and json for each mode
 
-        # Save stats as plots, csv and json and do so for each mode
+        :param p: partition
+        :param mode_stats: stats per mode, from get_stats_per_mode
+        :param mode_masks: masks per mode, from get_stats_per_mode
+        :param mode_names: names per mode, from get_stats_per_mode
+        """
         p.stats_mode_json = save_as_graphs_and_tables(
-            alti_map["im"].data,
+            alti_data,
             p.stats_dir,
             p.plots_dir,
             p.histograms_dir,
-            [mode_mask * outliers_free_mask for mode_mask in mode_masks],
+            [mode_mask & outliers_free_mask for mode_mask in mode_masks],
             mode_names,
             mode_stats,
             p.sets_masks[0],  # do not need 'ref' and 'dsm' only one of them
             p.sets_labels,
             p.sets_colors,
-            plot_title="\n".join(get_title(cfg)),
+            plot_title=plot_title,
             bin_step=cfg["stats_opts"]["alti_error_threshold"]["value"],
             display=display,
             plot_real_hist=cfg["stats_opts"]["plot_real_hists"],
@@ -1199,6 +1300,43 @@ def alti_diff_stats(
         # - Best way: the partition generate itself its HTML page
         #   (string to create) and generate_report() concatenate generated pages
 
+    # For every partition get stats and save them as plots and tables.
+    # Plots and tables of a partition are saved by a single worker thread
+    # while stats of the next partitions are computed, as long as pyplot
+    # runs on the non interactive Agg backend (otherwise figures must be
+    # created from the main thread)
+    save_in_worker = not display and mpl.get_backend().lower() == "agg"
+    cfg["stats_results"]["partitions"] = {}
+    saved_partitions = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for p in partitions:
+            # Compute stats for each mode and every sets
+            mode_stats, mode_masks, mode_names = get_stats_per_mode(
+                alti_map,
+                sets_masks=p.sets_masks,
+                sets_labels=p.sets_labels,
+                sets_names=p.sets_names,
+                elevation_thresholds=elevation_thresholds,
+                outliers_free_mask=outliers_free_mask,
+            )
+
+            if save_in_worker:
+                saved_partitions.append(
+                    executor.submit(
+                        save_partition_stats,
+                        p,
+                        mode_stats,
+                        mode_masks,
+                        mode_names,
+                    )
+                )
+            else:
+                save_partition_stats(p, mode_stats, mode_masks, mode_names)
+
+        # propagate errors raised while saving
+        for saved_partition in saved_partitions:
+            saved_partition.result()
+
 
 def save_as_graphs_and_tables(
     data_array,
@@ -1243,6 +1381,15 @@ def save_as_graphs_and_tables(
     else:
         sets_colors = np.array([(0, 0, 0)])
 
+    # The 'all' set is the same for every mode
+    # (plot_histograms does not modify the given sets)
+    all_set = np.ones((1,) + data_array.shape, dtype=bool)
+    if np.ndim(sets_masks) == 3:
+        sets_with_all = np.concatenate((all_set, sets_masks))
+    else:
+        # default partition: its single mask is no set of its own
+        sets_with_all = all_set
+
     for mode_idx, mode_name_item in enumerate(mode_names):
         #
         # Create plots for the actual mode and for all sets
@@ -1254,7 +1401,7 @@ def save_as_graphs_and_tables(
                     data_array,
                     bin_step=bin_step,
                     to_keep_mask=mode_masks[mode_idx],
-                    sets=[np.ones(data_array.shape, dtype=bool)] + sets_masks,
+                    sets=sets_with_all,
                     sets_labels=sets_labels,
                     sets_colors=sets_colors,
                     plot_title=plot_title,
@@ -1333,6 +1480,13 @@ def get_stats_per_mode(
     # (sets_masks will be cross checked if len(sets_masks)==2)
     mode_masks, mode_names = create_mode_masks(data, sets_masks)
 
+    # Sets are the same for all modes, they are encoded once
+    # (do not need ref and dsm but only one of them)
+    sets = sets_masks[0]
+    sets_idx_map = None
+    if sets_labels is not None and sets_names is not None:
+        sets_idx_map = create_sets_idx_map(sets, data["im"].data.shape)
+
     # Next is done for all modes
     mode_stats = []
     for mode_idx, _ in enumerate(mode_names):
@@ -1343,12 +1497,11 @@ def get_stats_per_mode(
                 data["im"].data,
                 to_keep_mask=mode_masks[mode_idx],
                 outliers_free_mask=outliers_free_mask,
-                sets=sets_masks[
-                    0
-                ],  # do not need ref and dsm but only one of them
+                sets=sets,
                 sets_labels=sets_labels,
                 sets_names=sets_names,
                 list_threshold=elevation_thresholds,
+                sets_idx_map=sets_idx_map,
             )
         )
 
@@ -1366,33 +1519,81 @@ def wave_detection(cfg, dh):
     """
     # Compute mean dh row and mean dh col
     # -> then compute min between dh mean row (col) vector and dh rows (cols)
+    dh_data = dh["im"].data
+    nb_rows, nb_cols = dh_data.shape
+    block_rows = 256
+
+    # First pass, by blocks of rows, accumulating together
+    # the sums and valid points counts along both axes
+    # (nan values are replaced by zeros as np.nanmean does)
+    # -> the first row of the block buffer holds the sum of the previous
+    #    blocks so that columns are summed in the same order as np.sum
+    sum_axis_0 = np.zeros((1, nb_cols), dtype=dh_data.dtype)
+    count_axis_0 = np.zeros((1, nb_cols), dtype=np.intp)
+    sum_axis_1 = np.empty((nb_rows, 1), dtype=dh_data.dtype)
+    count_axis_1 = np.empty((nb_rows, 1), dtype=np.intp)
+    block_buffer = np.empty((block_rows + 1, nb_cols), dtype=dh_data.dtype)
+    for first_row in range(0, nb_rows, block_rows):
+        block = dh_data[first_row : first_row + block_rows]
+        block_slice = slice(first_row, first_row + block.shape[0])
+        block_valid_mask = ~np.isnan(block)
+        block_nan_free = block_buffer[1 : block.shape[0] + 1]
+        np.copyto(block_nan_free, block)
+        block_nan_free[~block_valid_mask] = 0
+        sum_axis_1[block_slice] = np.sum(block_nan_free, axis=1, keepdims=True)
+        count_axis_1[block_slice] = np.sum(
+            block_valid_mask, axis=1, dtype=np.intp, keepdims=True
+        )
+        block_buffer[0] = sum_axis_0
+        sum_axis_0 = np.sum(
+            block_buffer[: block.shape[0] + 1], axis=0, keepdims=True
+        )
+        count_axis_0 += np.sum(block_valid_mask, axis=0, dtype=np.intp)
+
+    # Means keep the reduced axis so that they broadcast along it
+    with np.errstate(invalid="ignore"):
+        mean_axis_0 = np.true_divide(
+            sum_axis_0, count_axis_0, out=sum_axis_0, casting="unsafe"
+        )
+        mean_axis_1 = np.true_divide(
+            sum_axis_1, count_axis_1, out=sum_axis_1, casting="unsafe"
+        )
+
+    # Second pass, by blocks of rows, removing both means at once
     res = {
-        "row_wise": np.zeros(dh["im"].data.shape, dtype=np.float32),
-        "col_wise": np.zeros(dh["im"].data.shape, dtype=np.float32),
+        "row_wise": np.empty_like(dh_data),
+        "col_wise": np.empty_like(dh_data),
     }
-    axis = -1
-    for dim in list(res.keys()):
-        axis += 1
-        mean = np.nanmean(dh["im"].data, axis=axis)
-        if axis == 1:
-            # for axis == 1, we need to transpose the array to substitute it
-            # to dh.r otherwise 1D array stays row array
-            mean = np.transpose(
-                np.ones((1, mean.size), dtype=np.float32) * mean
-            )
-        res[dim] = dh["im"].data - mean
+    for first_row in range(0, nb_rows, block_rows):
+        block_slice = slice(first_row, first_row + block_rows)
+        block = dh_data[block_slice]
+        np.subtract(block, mean_axis_0, out=res["row_wise"][block_slice])
+        np.subtract(
+            block, mean_axis_1[block_slice], out=res["col_wise"][block_slice]
+        )
 
+    for dim in ["row_wise", "col_wise"]:
         cfg["stats_results"]["images"]["list"].append(dim)
-        cfg["stats_results"]["images"][dim] = copy.deepcopy(
-            cfg["alti_results"]["dzMap"]
-        )
+        # dzMap description only holds scalars: a shallow copy is enough
+        cfg["stats_results"]["images"][dim] = dict(cfg["alti_results"]["dzMap"])
         cfg["stats_results"]["images"][dim].pop("nb_points")
         cfg["stats_results"]["images"][dim]["path"] = os.path.join(
             cfg["outputDir"],
             get_out_file_path("dh_{}_wave_detection.tif".format(dim)),
         )
 
+    def save_wave_image(dim):
+        """
+        Save a wave detection image
+
+        :param dim: 'row_wise' or 'col_wise'
+        """
         georaster = read_img_from_array(
             res[dim], from_dataset=dh, no_data=-32768
         )
         save_tif(georaster, cfg["stats_results"]["images"][dim]["path"])
+
+    # Both images are independent: they are written concurrently
+    # (GDAL releases the GIL while writing)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(save_wave_image, ["row_wise", "col_wise"]))